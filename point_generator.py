@@ -28,10 +28,13 @@ import sys
 
 import toml
 from scripts.grid_generator import generate_grid as gg
+from scripts.grid_generator import generate_multi_resolution_grid as gmg
 from scripts.weight_based_fixed_point_nr import weight_based_generator as wn
 from scripts.weight_based import weight_based as w
 from scripts.shapefile_with_distance import shapefile_with_distance as sd
 from scripts.shapefile_with_weight import shapefile_with_weight as sw
+from scripts.helpers.shards import parse_shard, merge_partial_outputs
+from scripts import planner
 import argparse
 import json
 
@@ -40,8 +43,8 @@ HELP_MESSAGE = """
 Help for Grid Generator (grid)
 --ip: File containing grid border points
 --sf: Location of the shape file
---d: Distance between two points
---of: Location of the output file
+--d: Distance between two points, several distances generate one grid per distance
+--of: Location of the output file, must contain {distance} when several distances are given
 Weight Based (weight):
 --wf: Location of the weighted file
 --of: Location of the output file
@@ -57,8 +60,20 @@ Shapefile with Weight (shapefile_w_weight):
 --gf: Location of the shapefile which represents geography
 --of: Location of the output file
 --p: Preference for point placement, either larger_weight or smaller_weight
+Merge Line Segments (shapefile_w_distance, shapefile_w_weight):
+--merge_by: Merge contiguous segments with the same values in these columns, cached next to --sf
+Geodesic Spacing (grid, shapefile_w_distance):
+--geodesic: Place points at the true distance in miles apart
+Plan (every algorithm):
+--plan: Print the expected number of points, runtime and peak memory without generating anything
+Shards (weight, shapefile_w_weight):
+--shard: Run only shard i of N, given as i/N, and write a partial output next to --of
+Merge Shards (merge):
+--of: Location of the output file given to every shard
         """
 
+OPTIONAL_ARGUMENTS = ['shard', 'geodesic', 'plan', 'merge_by']
+
 
 def display_help_for_algorithm(alg):
     help_message = ""
@@ -68,8 +83,8 @@ def display_help_for_algorithm(alg):
 Grid Generator (grid)
 --ip: File containing grid border points
 --sf: Location of the shape file
---of: Location of the output file
---d: Distance between two points
+--of: Location of the output file, must contain {distance} when several distances are given
+--d: Distance between two points, several distances generate one grid per distance
 """
     elif args.alg == 'weight_w_num_points':
         help_message = """
@@ -133,12 +148,12 @@ if __name__ == '__main__':
 
     parser.add_argument(
         '--alg',
-        choices=['grid', 'weight_w_num_points', 'weight', 'shapefile_w_distance', 'shapefile_w_weight'],
-        help='Select the algorithm: grid - grid generator, weight_w_num_points - weight based point selection with number of points as an input, weight - weight based point selection, shapefile_w_distance - points selected based on the shapefile and distance between points as input parameters, shapefile_w_weight - points selected based on the shapefile and weight file which are input parameters',
+        choices=['grid', 'weight_w_num_points', 'weight', 'shapefile_w_distance', 'shapefile_w_weight', 'merge'],
+        help='Select the algorithm: grid - grid generator, weight_w_num_points - weight based point selection with number of points as an input, weight - weight based point selection, shapefile_w_distance - points selected based on the shapefile and distance between points as input parameters, shapefile_w_weight - points selected based on the shapefile and weight file which are input parameters, merge - merge the partial outputs of all shards',
     )
 
     parser.add_argument('--ip', help='File containing grid border points', type=str)
-    parser.add_argument('--d', help='Distance between two points expressed in miles', type=float)
+    parser.add_argument('--d', help='Distance between two points expressed in miles, several distances generate one grid per distance', type=float, nargs='+')
     parser.add_argument('--of', help='Location of the output file', type=str)
     parser.add_argument('--wf', help='Location of the weighted file', type=str)
     parser.add_argument('--n', help='Number of points', type=int)
@@ -148,6 +163,10 @@ if __name__ == '__main__':
     parser.add_argument('--conf', help='Path to the TOML configuration file', type=str, default='res/config.toml')
     parser.add_argument('--gf', help='Location of the shapefile which represents geography', type=str)
     parser.add_argument('--p', help='Preference for point placement, either larger_weight or smaller_weight', type=str)
+    parser.add_argument('--geodesic', help='Place points at the true distance in miles apart for grid and shapefile_w_distance', action='store_true')
+    parser.add_argument('--plan', help='Print the expected number of points, runtime and peak memory without generating anything', action='store_true')
+    parser.add_argument('--merge_by', help='Merge contiguous line segments with the same values in these columns, for example RTTYP FULLNAME, before generating points with shapefile_w_distance and shapefile_w_weight', type=str, nargs='+')
+    parser.add_argument('--shard', help='Run only shard i of N, given as i/N, for weight and shapefile_w_weight', type=str)
 
     args = parser.parse_args()
 
@@ -159,22 +178,53 @@ if __name__ == '__main__':
     config = toml.load(config_path)
     required_args_count = config['required_args_count']
 
-    if args.alg in required_args_count:
-        if len(vars(args)) != required_args_count[args.alg]:
+    shard = None
+    if args.shard:
+        try:
+            shard = parse_shard(args.shard)
+        except ValueError as e:
+            print(e)
+            sys.exit()
+
+    if args.alg == 'merge':
+        try:
+            merge_partial_outputs(args.of)
+        except ValueError as e:
+            print(e)
+            sys.exit()
+    elif args.alg in required_args_count:
+        if len(vars(args)) - len(OPTIONAL_ARGUMENTS) != required_args_count[args.alg]:
             display_help_for_algorithm(args.alg)
+        elif args.plan:
+            calibration = config.get('plan')
+            if args.alg == 'grid':
+                plan = planner.plan_grid(args.ip, args.sf, args.d, args.geodesic, calibration)
+            elif args.alg == 'weight_w_num_points':
+                plan = planner.plan_weight_w_num_points(args.wf, args.n, calibration)
+            elif args.alg == 'weight':
+                budget = config['budget'].get(args.b, args.b)
+                plan = planner.plan_weight(args.wf, args.sf, args.r, float(budget), config['config']['max_num_per_screen'], calibration, shard)
+            elif args.alg == 'shapefile_w_distance':
+                plan = planner.plan_shapefile_with_distance(args.sf, float(args.b), args.geodesic, calibration, args.merge_by)
+            elif args.alg == 'shapefile_w_weight':
+                plan = planner.plan_shapefile_with_weight(args.sf, args.gf, calibration, shard, args.merge_by)
+            print(json.dumps(plan, indent=4))
         else:
             if args.alg == 'grid':
-                gg(args.ip, args.sf, args.of, args.d)
+                if len(args.d) > 1:
+                    gmg(args.ip, args.sf, args.of, args.d, args.geodesic)
+                else:
+                    gg(args.ip, args.sf, args.of, args.d[0], args.geodesic)
             elif args.alg == 'weight_w_num_points':
                 wn(args.wf, args.of, args.n)
             elif args.alg == 'weight':
                 config_file = "res/config.toml"
                 config = toml.load(config_file)
-                w(args.wf, args.of, args.sf, args.r, args.b, config['config']['max_num_per_screen'])
+                w(args.wf, args.of, args.sf, args.r, args.b, config['config']['max_num_per_screen'], shard)
             elif args.alg == 'shapefile_w_distance':
-                sd(args.sf, args.of, args.b)
+                sd(args.sf, args.of, float(args.b), args.geodesic, args.merge_by)
             elif args.alg == 'shapefile_w_weight':
-                sw(args.sf, args.gf, args.of, args.p)
+                sw(args.sf, args.gf, args.of, args.p, shard, args.merge_by)
     else:
         print(f"Invalid algorithm choice: {args.alg}")
         parser.print_help()
@@ -0,0 +1,212 @@
+"""
+Point Generator API
+
+This module exposes every algorithm as a set of in-memory stages which can be chained without intermediate files:
+load, filter, sample, thin, transform and write. Layers and generated points are passed between the stages as
+GeoDataFrames, generated points are always in EPSG:4326.
+
+Example Usage:
+    from scripts import api
+
+    roads = api.load('res/roads-shapefile.zip')
+    roads = api.filter_by_parameters(roads, ('RTTYP', ['I', 'U', 'S']))
+    roads = api.merge_segments(roads, ['RTTYP', 'FULLNAME'])
+    points = api.lines_with_distance(roads, 0.001)
+    points = api.thin_to_msa(points, api.load('res/CBSA-(MSA)-2020-SL310-Coast-Clipped.zip'))
+    api.write(points, 'res/output.csv')
+"""
+
+import geopandas as gpd
+import pandas as pd
+from scripts.grid_generator import grid_inside_geography
+from scripts.weight_based_fixed_point_nr import read_weighted_points, select_weighted_points
+from scripts.weight_based import read_weights, generate_weight_based_points
+from scripts.shapefile_with_distance import points_on_line_with_distance, points_on_line_with_geodesic_distance
+from scripts.shapefile_with_weight import weighted_points_on_lines
+from scripts.helpers.utils import coordinates_to_points, points_to_coordinates, merge_line_segments, points_in_msa
+from scripts.helpers.utils import filter_by_parameters as filter_layer_by_parameters
+from scripts.helpers.utils import save_coordinates_to_csv
+
+
+def load(file_name: str, crs: str = 'EPSG:4326') -> gpd.GeoDataFrame:
+    """
+    Load a shapefile.
+
+    :param file_name: Location of the shapefile.
+    :param crs: CRS to which the layer is converted.
+
+    :return: GeoDataFrame with the layer.
+    """
+    return gpd.read_file(file_name).to_crs(crs)
+
+
+def load_weights(file_name: str) -> pd.DataFrame:
+    """
+    Load the file which holds weight, used by weight_based.
+
+    :param file_name: Location of the file which holds weight.
+
+    :return: DataFrame with STATEFP, COUNTYFP, WEIGHT, LATITUDE and LONGITUDE columns.
+    """
+    return read_weights(file_name)
+
+
+def load_weighted_points(file_name: str) -> pd.DataFrame:
+    """
+    Load the file with point data and weight, used by weighted_points.
+
+    :param file_name: Location of the file with point data and weight.
+
+    :return: DataFrame with POPULATION, LATITUDE and LONGITUDE columns.
+    """
+    return read_weighted_points(file_name)
+
+
+def filter_by_state(layer, state: str):
+    """
+    Keep only the rows of a state.
+
+    :param layer: GeoDataFrame or DataFrame with a STATEFP column.
+    :param state: STATEFP code of the state.
+
+    :return: The filtered layer.
+    """
+    return layer[layer['STATEFP'] == state]
+
+
+def filter_by_parameters(layer, parameter_tuple: tuple):
+    """
+    Keep only the rows whose value in a column is one of the given values.
+
+    :param layer: GeoDataFrame or DataFrame to filter.
+    :param parameter_tuple: Tuple of (column name, list of values), for example ('RTTYP', ['I', 'U', 'S']).
+
+    :return: The filtered layer.
+    """
+    return filter_layer_by_parameters(layer, parameter_tuple)
+
+
+def merge_segments(lines: gpd.GeoDataFrame, columns: list) -> gpd.GeoDataFrame:
+    """
+    Merge contiguous line segments which have the same values in the given columns.
+
+    :param lines: GeoDataFrame with line geometries.
+    :param columns: Columns whose values have to match for segments to be merged.
+
+    :return: GeoDataFrame with one LineString per merged line.
+    """
+    return merge_line_segments(lines, columns)
+
+
+def grid(geography: gpd.GeoDataFrame, distance: float, border_points: tuple = None,
+         geodesic_spacing: bool = False) -> gpd.GeoDataFrame:
+    """
+    Generate a grid of points inside the geography.
+
+    :param geography: GeoDataFrame in EPSG:4326 holding the geographical boundaries.
+    :param distance: Distance between the generated points in miles.
+    :param border_points: Optional (northwestern, southwestern, northeastern) points as (latitude, longitude). The
+                          bounds of the geography are used when they are not given.
+    :param geodesic_spacing: Place the points at the true distance apart with a longitude step for every row.
+
+    :return: GeoDataFrame with the generated points.
+    """
+    if border_points is None:
+        min_lon, min_lat, max_lon, max_lat = geography.total_bounds
+        border_points = ((max_lat, min_lon), (min_lat, min_lon), (max_lat, max_lon))
+
+    northwestern, southwestern, northeastern = border_points
+    return coordinates_to_points(grid_inside_geography(northwestern, southwestern, northeastern, geography, distance,
+                                                       geodesic_spacing))
+
+
+def weight_based(weights: pd.DataFrame, county_polygons: gpd.GeoDataFrame, relation: float, budget: float,
+                 max_points: int) -> gpd.GeoDataFrame:
+    """
+    Generate random points inside every county, their number is calculated from the county's weight.
+
+    :param weights: DataFrame returned by load_weights.
+    :param county_polygons: GeoDataFrame with county polygons and STATEFP and COUNTYFP columns.
+    :param relation: The relation value which represents relation between weight and certain enterprise.
+    :param budget: The budget value which represents the budget one want to use when searching for points.
+    :param max_points: The maximum number of establishment that can be scraped for every points selected.
+
+    :return: GeoDataFrame with the generated points.
+    """
+    county_polygons = county_polygons.to_crs('EPSG:3857')
+    return coordinates_to_points(generate_weight_based_points(weights, county_polygons, relation, budget, max_points))
+
+
+def weighted_points(points_df: pd.DataFrame, number_of_points: int) -> gpd.GeoDataFrame:
+    """
+    Select the given number of points based on the weight of each point.
+
+    :param points_df: DataFrame returned by load_weighted_points.
+    :param number_of_points: The desired number of points to generate.
+
+    :return: GeoDataFrame with the selected points.
+    """
+    selected_points = select_weighted_points(points_df, number_of_points)
+    return coordinates_to_points(selected_points[['LATITUDE', 'LONGITUDE']].values)
+
+
+def lines_with_distance(lines: gpd.GeoDataFrame, distance: float, geodesic_spacing: bool = False) -> gpd.GeoDataFrame:
+    """
+    Generate points along the lines at the given distance.
+
+    :param lines: GeoDataFrame with line geometries in EPSG:4326.
+    :param distance: The distance between each interpolated point along the lines.
+    :param geodesic_spacing: Treat the distance as the true distance in miles instead of degrees.
+
+    :return: GeoDataFrame with the generated points.
+    """
+    if geodesic_spacing:
+        return coordinates_to_points(points_on_line_with_geodesic_distance(lines, distance))
+    return coordinates_to_points(points_on_line_with_distance(lines, distance))
+
+
+def lines_with_weight(lines: gpd.GeoDataFrame, geography: gpd.GeoDataFrame, preference: str) -> gpd.GeoDataFrame:
+    """
+    Generate points along the lines based on the weight of each line in the geography.
+
+    :param lines: GeoDataFrame with line geometries.
+    :param geography: GeoDataFrame representing the geographic boundaries.
+    :param preference: Preference for point placement, either 'larger_weight' or 'smaller_weight'.
+
+    :return: GeoDataFrame with the generated points.
+    """
+    return coordinates_to_points(weighted_points_on_lines(lines, geography, preference))
+
+
+def thin_to_msa(points: gpd.GeoDataFrame, msa: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
+    """
+    Keep only the points inside the metropolitan statistical areas.
+
+    :param points: GeoDataFrame with points.
+    :param msa: GeoDataFrame with metropolitan statistical areas.
+
+    :return: GeoDataFrame with the points inside the metropolitan statistical areas.
+    """
+    return points_in_msa(points, msa.to_crs(points.crs))[points.columns]
+
+
+def transform(points: gpd.GeoDataFrame, crs: str) -> gpd.GeoDataFrame:
+    """
+    Convert the points to another CRS.
+
+    :param points: GeoDataFrame with points.
+    :param crs: The target CRS.
+
+    :return: GeoDataFrame with the converted points.
+    """
+    return points.to_crs(crs)
+
+
+def write(points: gpd.GeoDataFrame, output_file: str):
+    """
+    Save the points to a CSV file with LATITUDE and LONGITUDE columns.
+
+    :param points: GeoDataFrame with points.
+    :param output_file: Location of the output file.
+    """
+    save_coordinates_to_csv(points_to_coordinates(points.to_crs('EPSG:4326')), output_file)
@@ -4,32 +4,37 @@ import pandas as pd
 from geopy.distance import geodesic
 import geopandas as gpd
 from shapely.geometry import Point
+from scripts.helpers.utils import GEOD, METERS_PER_MILE
 
 
-def generate_grid(border_points_location_file1, shapefile, output_file, distance):
-
+def read_border_points(border_points_location_file1):
     """
-    This function generates dots within the border points at the specified distance apart, filters them
-    through the provided shapefile, and returns only those that fall within the shape. The result
-    contains the coordinates of the filtered dots.
+    Read the northwestern, southwestern and northeastern border points from the border points file.
 
     :param border_points_location_file1: Points for the northwestern, southwestern, northeastern and southeastern border point
-    :param distance: Distance between the generated dots (in longitude and latitude)
-    :param shapefile: The file path to the shapefile containing the geographical boundaries of the USA,
-                            used to filter the generated dots.
-    :param output_file: The file path where the result, containing the coordinates of the filtered dots, will be written.
 
-    :return: Result is written in a csv file that is provided in the function
+    :return: Tuple of (northwestern, southwestern, northeastern) points, each as (latitude, longitude).
     """
-
     border_points = pd.read_csv(border_points_location_file1)
 
     northwestern = tuple(border_points.iloc[0, [0, 1]])
     southwestern = tuple(border_points.iloc[1, [0, 1]])
     northeastern = tuple(border_points.iloc[2, [0, 1]])
 
-    geography = gpd.read_file(shapefile).to_crs("EPSG:4326")
+    return northwestern, southwestern, northeastern
+
+
+def grid_axes(northwestern, southwestern, northeastern, distance):
+    """
+    Calculate the latitudes and longitudes of the grid rows and columns for the given spacing.
+
+    :param northwestern: Northwestern border point as (latitude, longitude).
+    :param southwestern: Southwestern border point as (latitude, longitude).
+    :param northeastern: Northeastern border point as (latitude, longitude).
+    :param distance: Distance between the generated dots in miles.
 
+    :return: Tuple of (latitudes, longitudes) arrays.
+    """
     lat_distance_miles = geodesic(northwestern, southwestern).miles
     lat_total_dots = int(lat_distance_miles / distance) + 1
     lat_step = (northwestern[0] - southwestern[0]) / (lat_total_dots - 1)
@@ -40,10 +45,109 @@ def generate_grid(border_points_location_file1, shapefile, output_file, distance
     lon_step = (northeastern[1] - northwestern[1]) / (lon_total_dots - 1)
     longitudes = np.arange(northwestern[1], northeastern[1] + 0.1, lon_step)
 
+    return latitudes, longitudes
+
+
+def grid_points(latitudes, longitudes):
+    """
+    Build the grid points for the given rows and columns.
+
+    :param latitudes: Latitudes of the grid rows.
+    :param longitudes: Longitudes of the grid columns.
+
+    :return: Array of (latitude, longitude) pairs.
+    """
     lat_grid, lon_grid = np.meshgrid(latitudes, longitudes)
+    return np.array([lat_grid.ravel(), lon_grid.ravel()]).T
+
+
+def geodesic_grid_rows(northwestern, southwestern, northeastern, distance):
+    """
+    Calculate the rows of a grid with the true distance between the points, without building the points.
+
+    :param northwestern: Northwestern border point as (latitude, longitude).
+    :param southwestern: Southwestern border point as (latitude, longitude).
+    :param northeastern: Northeastern border point as (latitude, longitude).
+    :param distance: Distance between the generated dots in miles.
 
-    points = np.array([lat_grid.ravel(), lon_grid.ravel()]).T
+    :return: Tuple of (latitudes, lon_steps, column_counts) arrays with the latitude, the longitude step and the
+             number of points of every row.
+    """
+    north_latitude, west_longitude = northwestern
+    south_latitude = southwestern[0]
+    east_longitude = northeastern[1]
+    step = distance * METERS_PER_MILE
+
+    _, _, lat_distance = GEOD.inv(west_longitude, north_latitude, west_longitude, south_latitude)
+    row_count = int(lat_distance / step) + 1
+
+    west_longitudes = np.full(row_count, west_longitude)
+    _, latitudes, _ = GEOD.fwd(west_longitudes, np.full(row_count, north_latitude), np.full(row_count, 180.0),
+                               np.arange(row_count) * step)
+    latitudes = np.asarray(latitudes)
+
+    _, _, meters_per_hundredth = GEOD.inv(west_longitudes, latitudes, west_longitudes + 0.01, latitudes)
+    lon_steps = step / (np.asarray(meters_per_hundredth) * 100)
+    column_counts = np.floor((east_longitude - west_longitude) / lon_steps).astype(int) + 1
+
+    return latitudes, lon_steps, column_counts
+
+
+def geodesic_grid_points(northwestern, southwestern, northeastern, distance):
+    """
+    Build the grid points at the true distance apart. Rows are placed along the western border at the distance
+    from each other and every row gets its own longitude step, so the spacing does not shrink away from the equator.
+
+    :param northwestern: Northwestern border point as (latitude, longitude).
+    :param southwestern: Southwestern border point as (latitude, longitude).
+    :param northeastern: Northeastern border point as (latitude, longitude).
+    :param distance: Distance between the generated dots in miles.
+
+    :return: Tuple of (points, rows, columns), where points is an array of (latitude, longitude) pairs and rows and
+             columns hold the row and column index of every point.
+    """
+    west_longitude = northwestern[1]
+    latitudes, lon_steps, column_counts = geodesic_grid_rows(northwestern, southwestern, northeastern, distance)
+    row_count = len(latitudes)
+
+    rows = np.repeat(np.arange(row_count), column_counts)
+    columns = np.arange(column_counts.sum()) - np.repeat(np.cumsum(column_counts) - column_counts, column_counts)
+    longitudes = west_longitude + columns * lon_steps[rows]
+
+    return np.array([latitudes[rows], longitudes]).T, rows, columns
 
+
+def indexed_grid_points(northwestern, southwestern, northeastern, distance, geodesic_spacing=False):
+    """
+    Build the grid points together with the row and column index of every point.
+
+    :param northwestern: Northwestern border point as (latitude, longitude).
+    :param southwestern: Southwestern border point as (latitude, longitude).
+    :param northeastern: Northeastern border point as (latitude, longitude).
+    :param distance: Distance between the generated dots in miles.
+    :param geodesic_spacing: Place the points at the true distance apart, see geodesic_grid_points.
+
+    :return: Tuple of (points, rows, columns).
+    """
+    if geodesic_spacing:
+        return geodesic_grid_points(northwestern, southwestern, northeastern, distance)
+
+    latitudes, longitudes = grid_axes(northwestern, southwestern, northeastern, distance)
+    rows = np.tile(np.arange(len(latitudes)), len(longitudes))
+    columns = np.repeat(np.arange(len(longitudes)), len(latitudes))
+
+    return grid_points(latitudes, longitudes), rows, columns
+
+
+def points_inside_geography(points, geography):
+    """
+    Classify the points against the geography.
+
+    :param points: Array of (latitude, longitude) pairs.
+    :param geography: GeoDataFrame in EPSG:4326 holding the geographical boundaries.
+
+    :return: Boolean array which is True for every point that falls within the geography.
+    """
     dots_df = pd.DataFrame(points, columns=['Latitude', 'Longitude'])
 
     geometry = [Point(xy) for xy in zip(dots_df['Longitude'], dots_df['Latitude'])]
@@ -53,10 +157,125 @@ def generate_grid(border_points_location_file1, shapefile, output_file, distance
 
     dots_inside_shapefile = gpd.sjoin(dots_gdf, geography, how="inner", predicate='within')
 
+    inside = np.zeros(len(points), dtype=bool)
+    inside[dots_inside_shapefile.index.unique()] = True
+    return inside
+
+
+def grid_inside_geography(northwestern, southwestern, northeastern, geography, distance, geodesic_spacing=False):
+    """
+    Generate the grid between the border points and keep only the points that fall within the geography.
+
+    :param northwestern: Northwestern border point as (latitude, longitude).
+    :param southwestern: Southwestern border point as (latitude, longitude).
+    :param northeastern: Northeastern border point as (latitude, longitude).
+    :param geography: GeoDataFrame in EPSG:4326 holding the geographical boundaries.
+    :param distance: Distance between the generated dots in miles.
+    :param geodesic_spacing: Place the points at the true distance apart, see geodesic_grid_points.
+
+    :return: Array of (latitude, longitude) pairs inside the geography.
+    """
+    points, _, _ = indexed_grid_points(northwestern, southwestern, northeastern, distance, geodesic_spacing)
+
+    return points[points_inside_geography(points, geography)]
+
+
+def write_grid(points, output_file):
+    """
+    Write the grid points to a csv file.
+
+    :param points: Array of (latitude, longitude) pairs.
+    :param output_file: The file path where the points will be written.
+    """
     with open(output_file, mode='w', newline='') as file:
         writer = csv.writer(file)
         writer.writerow(['Latitude', 'Longitude'])
-        writer.writerows(dots_inside_shapefile[['Latitude', 'Longitude']].values)
+        writer.writerows(points)
+
+
+def generate_grid(border_points_location_file1, shapefile, output_file, distance, geodesic_spacing=False):
+
+    """
+    This function generates dots within the border points at the specified distance apart, filters them
+    through the provided shapefile, and returns only those that fall within the shape. The result
+    contains the coordinates of the filtered dots.
+
+    :param border_points_location_file1: Points for the northwestern, southwestern, northeastern and southeastern border point
+    :param distance: Distance between the generated dots (in longitude and latitude)
+    :param shapefile: The file path to the shapefile containing the geographical boundaries of the USA,
+                            used to filter the generated dots.
+    :param output_file: The file path where the result, containing the coordinates of the filtered dots, will be written.
+    :param geodesic_spacing: Place the dots at the true distance in miles apart, with a separate longitude step for
+                            every row, instead of one longitude step calculated along the northern border.
+
+    :return: Result is written in a csv file that is provided in the function
+    """
+
+    northwestern, southwestern, northeastern = read_border_points(border_points_location_file1)
+
+    geography = gpd.read_file(shapefile).to_crs("EPSG:4326")
+
+    points = grid_inside_geography(northwestern, southwestern, northeastern, geography, distance, geodesic_spacing)
+
+    write_grid(points, output_file)
+
+
+def generate_multi_resolution_grid(border_points_location_file1, shapefile, output_file, distances,
+                                   geodesic_spacing=False):
+
+    """
+    This function generates grids for several distances over the same border points in a single pass.
+    The finest grid is classified against the shapefile once. Every coarser distance which is an integer
+    multiple of the finest one is built by taking every n-th row and column of the finest grid, so it
+    reuses the inside/outside classification of the finest grid. Such a nested grid snaps to the lattice of
+    the finest grid, so without geodesic spacing its longitude step is a multiple of the finest step and can
+    differ from the step of a single distance run, and its last row and column can stop up to one coarse step
+    short of the southern and eastern borders. Remaining distances are classified in the same spatial join
+    as the finest grid.
+
+    :param border_points_location_file1: Points for the northwestern, southwestern, northeastern and southeastern border point
+    :param shapefile: The file path to the shapefile containing the geographical boundaries of the USA,
+                            used to filter the generated dots.
+    :param output_file: The file path where the result will be written. It has to contain a '{distance}'
+                            placeholder which is replaced by the distance of each grid.
+    :param distances: List of distances between the generated dots in miles.
+    :param geodesic_spacing: Place the dots at the true distance in miles apart, see generate_grid.
+
+    :return: Results are written in one csv file per distance.
+    """
+    if '{distance}' not in output_file:
+        raise ValueError("Output file must contain a '{distance}' placeholder when generating multiple grids.")
+
+    northwestern, southwestern, northeastern = read_border_points(border_points_location_file1)
+
+    geography = gpd.read_file(shapefile).to_crs("EPSG:4326")
+
+    distances = sorted(set(distances))
+    finest_distance = distances[0]
+    finest_points, rows, columns = indexed_grid_points(northwestern, southwestern, northeastern, finest_distance,
+                                                       geodesic_spacing)
+
+    nested_steps = {}
+    other_points = {}
+    for distance in distances:
+        step = distance / finest_distance
+        if np.isclose(step, round(step)):
+            nested_steps[distance] = int(round(step))
+        else:
+            other_points[distance], _, _ = indexed_grid_points(northwestern, southwestern, northeastern, distance,
+                                                               geodesic_spacing)
+
+    inside = points_inside_geography(np.concatenate([finest_points, *other_points.values()]), geography)
+
+    finest_inside = inside[:len(finest_points)]
+    for distance, step in nested_steps.items():
+        nested = (rows % step == 0) & (columns % step == 0)
+        write_grid(finest_points[nested & finest_inside], output_file.format(distance=f'{distance:g}'))
+
+    offset = len(finest_points)
+    for distance, points in other_points.items():
+        write_grid(points[inside[offset:offset + len(points)]], output_file.format(distance=f'{distance:g}'))
+        offset += len(points)
 
 
 if __name__ == "__main__":
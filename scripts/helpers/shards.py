@@ -0,0 +1,139 @@
+import glob
+import json
+import os
+import re
+import pandas as pd
+from scripts.helpers.utils import save_coordinates_to_csv
+
+
+def parse_shard(shard: str) -> tuple:
+    """
+    Parse a shard given as 'i/N', where i goes from 1 to N.
+
+    :param shard: The shard in the 'i/N' format.
+
+    :return: Tuple of (index, count).
+    """
+    match = re.fullmatch(r'\s*(\d+)\s*/\s*(\d+)\s*', shard)
+    if match is None:
+        raise ValueError(f"Invalid shard '{shard}'. Expected format is i/N, for example 1/4.")
+
+    index, count = int(match.group(1)), int(match.group(2))
+    if not 1 <= index <= count:
+        raise ValueError(f"Invalid shard '{shard}'. Shard index must be between 1 and {count}.")
+
+    return index, count
+
+
+STATE_CODES = [f'{code:02d}' for code in range(1, 100)]
+
+
+def shard_states(shard: tuple) -> list:
+    """
+    Select the STATEFP codes which belong to a shard. Every code is assigned by its number modulo the number of
+    shards, so each shard knows its states before reading any input and every machine gets the same states.
+
+    :param shard: Tuple of (index, count) returned by parse_shard.
+
+    :return: Sorted list of STATEFP codes which belong to the shard.
+    """
+    index, count = shard
+    return [code for code in STATE_CODES if int(code) % count == index - 1]
+
+
+def states_where_clause(states: list) -> str:
+    """
+    Build a where clause which selects the features of the given states when reading a shapefile.
+
+    :param states: STATEFP codes.
+
+    :return: The where clause.
+    """
+    quoted_states = ', '.join(f"'{state}'" for state in states)
+    return f"STATEFP IN ({quoted_states})"
+
+
+def partial_output_file(output_file: str, shard: tuple) -> str:
+    """
+    Get the location of the partial output of a shard.
+
+    :param output_file: Location of the final output file.
+    :param shard: Tuple of (index, count) returned by parse_shard.
+
+    :return: Location of the partial output file.
+    """
+    index, count = shard
+    return f"{output_file}.part-{index}-of-{count}.csv"
+
+
+def write_partial_output(coordinates: list, output_file: str, shard: tuple, algorithm: str, states: list,
+                         parameters: dict):
+    """
+    Save the points of a shard together with a manifest describing the shard.
+
+    :param coordinates: List of coordinates in the format [(latitude, longitude), ...].
+    :param output_file: Location of the final output file.
+    :param shard: Tuple of (index, count) returned by parse_shard.
+    :param algorithm: Name of the algorithm which generated the points.
+    :param states: STATEFP codes processed by the shard.
+    :param parameters: Parameters of the run, which have to be the same for every shard.
+    """
+    index, count = shard
+    partial_file = partial_output_file(output_file, shard)
+
+    save_coordinates_to_csv(coordinates, partial_file)
+
+    manifest = {
+        'algorithm': algorithm,
+        'shard': index,
+        'shards': count,
+        'partition': 'STATEFP',
+        'states': list(states),
+        'parameters': parameters,
+        'points': len(coordinates),
+    }
+    with open(f"{partial_file}.json", 'w') as f:
+        json.dump(manifest, f, indent=4)
+
+
+def merge_partial_outputs(output_file: str):
+    """
+    Merge the partial outputs of every shard into the final output file. All shards have to be present, come from
+    the same run and be complete.
+
+    :param output_file: Location of the final output file, the same one which was given to every shard.
+    """
+    manifests = []
+    for manifest_file in glob.glob(f"{glob.escape(output_file)}.part-*-of-*.csv.json"):
+        with open(manifest_file, 'r') as f:
+            manifests.append(json.load(f))
+
+    if not manifests:
+        raise ValueError(f"No partial outputs found for {output_file}.")
+
+    first = manifests[0]
+    for manifest in manifests:
+        if (manifest['algorithm'], manifest['shards'], manifest['parameters']) != \
+                (first['algorithm'], first['shards'], first['parameters']):
+            raise ValueError(f"Partial outputs for {output_file} come from different runs.")
+
+    count = first['shards']
+    present = {manifest['shard'] for manifest in manifests}
+    missing = sorted(set(range(1, count + 1)) - present)
+    if missing:
+        raise ValueError(f"Missing shards {', '.join(f'{index}/{count}' for index in missing)} for {output_file}.")
+
+    missing = sorted(manifest['shard'] for manifest in manifests
+                     if not os.path.exists(partial_output_file(output_file, (manifest['shard'], count))))
+    if missing:
+        raise ValueError(f"Missing shards {', '.join(f'{index}/{count}' for index in missing)} for {output_file}.")
+
+    partial_outputs = []
+    for manifest in sorted(manifests, key=lambda m: m['shard']):
+        partial_output = pd.read_csv(partial_output_file(output_file, (manifest['shard'], count)))
+        if len(partial_output) != manifest['points']:
+            raise ValueError(f"Partial output of shard {manifest['shard']}/{count} is incomplete.")
+        partial_outputs.append(partial_output)
+
+    merged = pd.concat(partial_outputs, ignore_index=True)
+    save_coordinates_to_csv(merged[['LATITUDE', 'LONGITUDE']].values, output_file)
@@ -1,9 +1,17 @@
+import hashlib
 import os
 import shutil
 import tempfile
 import zipfile
+import numpy as np
 import pandas as pd
 import geopandas as gpd
+import shapely
+from pyproj import Geod
+
+
+GEOD = Geod(ellps='WGS84')
+METERS_PER_MILE = 1609.344
 
 
 def save_coordinates_to_csv(coordinates: list, output_file: str):
@@ -17,24 +25,75 @@ def save_coordinates_to_csv(coordinates: list, output_file: str):
     df.to_csv(output_file, index=False)
 
 
-def filter_shapefile_by_parameters(input_shapefile, parameter_tuple, output_zipfile):
+def coordinates_to_points(coordinates: list) -> gpd.GeoDataFrame:
+    """
+    Convert a list of coordinates to a GeoDataFrame of points.
+
+    :param coordinates: List of coordinates in the format [(latitude, longitude), ...].
+
+    :return: GeoDataFrame with point geometries in EPSG:4326.
+    """
+    latitudes = [coordinate[0] for coordinate in coordinates]
+    longitudes = [coordinate[1] for coordinate in coordinates]
+    return gpd.GeoDataFrame(geometry=gpd.points_from_xy(longitudes, latitudes), crs='EPSG:4326')
+
+
+def points_to_coordinates(points: gpd.GeoDataFrame) -> list:
+    """
+    Convert a GeoDataFrame of points to a list of coordinates.
+
+    :param points: GeoDataFrame with point geometries in EPSG:4326.
+
+    :return: List of coordinates in the format [(latitude, longitude), ...].
+    """
+    return list(zip(points.geometry.y, points.geometry.x))
+
+
+def points_in_msa(generated_points_gdf: gpd.GeoDataFrame, msa: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
+    """
+    Keep only the points that intersect the metropolitan statistical areas.
+
+    :param generated_points_gdf: GeoDataFrame with points in EPSG:4326.
+    :param msa: GeoDataFrame with metropolitan statistical areas in EPSG:4326.
+
+    :return: GeoDataFrame with the points inside the metropolitan statistical areas.
+    """
+    return gpd.sjoin(generated_points_gdf, msa, how='inner', predicate='intersects')
+
+
+def filter_by_parameters(gdf: gpd.GeoDataFrame, parameter_tuple) -> gpd.GeoDataFrame:
+    """
+    Keep only the features whose column value is one of the given values.
+
+    :param gdf: GeoDataFrame to filter.
+    :param parameter_tuple: Tuple of (column name, list of values), for example ('RTTYP', ['I', 'U', 'S']).
+
+    :return: The filtered GeoDataFrame.
+    """
     column_name, parameter_list = parameter_tuple
+    return gdf[gdf[column_name].isin(parameter_list)]
 
+
+def filter_shapefile_by_parameters(input_shapefile, parameter_tuple, output_zipfile):
     gdf = gpd.read_file(input_shapefile)
 
-    filtered_features = []
+    filtered_gdf = filter_by_parameters(gdf, parameter_tuple).set_crs('EPSG:4326', allow_override=True)
 
-    for param_value in parameter_list:
-        filtered_features.extend(gdf[gdf[column_name].isin([param_value])].to_dict(orient='records'))
+    save_shapefile_to_zip(filtered_gdf, output_zipfile)
 
-    filtered_gdf = gpd.GeoDataFrame(filtered_features)
 
-    filtered_gdf = filtered_gdf.set_crs('EPSG:4326')
+def save_shapefile_to_zip(gdf: gpd.GeoDataFrame, output_zipfile: str, shapefile_name: str = 'filtered_shapefile.shp'):
+    """
+    Save a GeoDataFrame as a zipped shapefile.
 
+    :param gdf: GeoDataFrame to save.
+    :param output_zipfile: Location of the zip file.
+    :param shapefile_name: Name of the shapefile inside the zip file.
+    """
     temp_dir = tempfile.mkdtemp()
-    temp_shapefile = os.path.join(temp_dir, 'filtered_shapefile.shp')
+    temp_shapefile = os.path.join(temp_dir, shapefile_name)
 
-    filtered_gdf.to_file(temp_shapefile)
+    gdf.to_file(temp_shapefile)
 
     with zipfile.ZipFile(output_zipfile, 'w') as zipf:
         for root, _, files in os.walk(temp_dir):
@@ -42,4 +101,85 @@ def filter_shapefile_by_parameters(input_shapefile, parameter_tuple, output_zipf
                 file_path = os.path.join(root, file)
                 zipf.write(file_path, os.path.relpath(file_path, temp_dir))
 
-    shutil.rmtree(temp_dir)
\ No newline at end of file
+    shutil.rmtree(temp_dir)
+
+
+def merge_line_segments(lines: gpd.GeoDataFrame, columns: list) -> gpd.GeoDataFrame:
+    """
+    Merge contiguous line segments which have the same values in the given columns into longer lines.
+
+    :param lines: GeoDataFrame with line geometries.
+    :param columns: Columns whose values have to match for segments to be merged, for example ['RTTYP', 'FULLNAME'].
+
+    :return: GeoDataFrame with one LineString per merged line.
+    """
+    merged = lines.dissolve(by=columns, dropna=False, as_index=False)
+    merged_geometry = shapely.line_merge(np.asarray(merged.geometry))
+    merged = merged.set_geometry(gpd.GeoSeries(merged_geometry, index=merged.index, crs=merged.crs))
+    return merged.explode(index_parts=False, ignore_index=True)
+
+
+def shapefile_digest(input_shapefile: str, chunk_size: int = 1 << 20) -> str:
+    """
+    Hash the contents of a shapefile in chunks. For a .shp file the sidecar files with the same name, such as the
+    .dbf with the attributes, are hashed too.
+
+    :param input_shapefile: Location of the shapefile, either a .shp file or a single file such as a zip.
+    :param chunk_size: The number of bytes read at once.
+
+    :return: Hex digest of the contents.
+    """
+    root, extension = os.path.splitext(input_shapefile)
+    files = [input_shapefile]
+    if extension.lower() == '.shp':
+        files += [root + sidecar for sidecar in ('.shx', '.dbf', '.prj', '.cpg') if os.path.exists(root + sidecar)]
+
+    digest = hashlib.sha256()
+    for file in files:
+        with open(file, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def merged_lines_cache_file(input_shapefile, columns, parameter_tuple=None) -> str:
+    """
+    Get the location of the zip file in which the merged lines of a shapefile are cached. The name is derived from
+    the contents of the shapefile, the columns and the filtering parameters, so every run on the same input reuses
+    the cache and any change to them creates a new one.
+
+    :param input_shapefile: Location of the shapefile with line segments.
+    :param columns: Columns whose values have to match for segments to be merged.
+    :param parameter_tuple: Optional tuple of (column name, list of values) used to filter the segments first.
+
+    :return: Location of the cache zip file next to the input shapefile.
+    """
+    key = f"{shapefile_digest(input_shapefile)} {','.join(columns)} {parameter_tuple}"
+    return f"{os.path.splitext(input_shapefile)[0]}.merged-{hashlib.sha256(key.encode()).hexdigest()[:16]}.zip"
+
+
+def load_merged_lines(input_shapefile, columns, parameter_tuple=None) -> gpd.GeoDataFrame:
+    """
+    Load a shapefile with line segments, optionally filter it, and merge contiguous segments. The merged lines are
+    cached in a zipped shapefile next to the input, see merged_lines_cache_file, and loaded from it as long as the
+    input shapefile, the columns and the filtering parameters do not change.
+
+    :param input_shapefile: Location of the shapefile with line segments.
+    :param columns: Columns whose values have to match for segments to be merged, for example ['RTTYP', 'FULLNAME'].
+    :param parameter_tuple: Optional tuple of (column name, list of values) used to filter the segments first.
+
+    :return: GeoDataFrame with one LineString per merged line.
+    """
+    cache_zipfile = merged_lines_cache_file(input_shapefile, columns, parameter_tuple)
+    if os.path.exists(cache_zipfile):
+        return gpd.read_file(cache_zipfile)
+
+    lines = gpd.read_file(input_shapefile)
+    if parameter_tuple is not None:
+        lines = filter_by_parameters(lines, parameter_tuple)
+
+    merged_lines = merge_line_segments(lines, columns)
+    save_shapefile_to_zip(merged_lines, f"{cache_zipfile}.tmp", 'merged_shapefile.shp')
+    os.replace(f"{cache_zipfile}.tmp", cache_zipfile)
+
+    return merged_lines
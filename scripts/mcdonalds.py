@@ -3,9 +3,8 @@ import toml
 import random
 import pandas as pd
 import geopandas as gpd
-import tqdm as tqdm
 from pyproj import Transformer
-from scripts.helpers.utils import save_coordinates_to_csv
+from scripts.helpers.utils import save_coordinates_to_csv, points_in_msa
 from scripts.helpers.helpers import column_descriptions
 
 
@@ -125,7 +124,7 @@ def mc_donald(generated_points_gdf: gpd.geodataframe, output_file: str):
     msa = msa[msa['Geo_FIPS'].str.startswith('49')]
     msa = msa.to_crs(epsg=4326)
 
-    filtered_points = gpd.sjoin(generated_points_gdf, msa, how='inner', predicate='intersects')
+    filtered_points = points_in_msa(generated_points_gdf, msa)
 
     save_coordinates_to_csv([(point.y, point.x) for point in filtered_points.geometry], output_file)
 
@@ -0,0 +1,228 @@
+"""
+Point Generator Planner
+
+This script estimates the number of generated points, the runtime and the peak memory of every algorithm without
+generating any points. Point counts come from the same cheap precomputation the algorithms start with: grid sizes
+and the share of the border box covered by the shapefile for grids, quota sums for weight based algorithms, line
+lengths divided by the distance for shapefile_w_distance and line-county pairs for shapefile_w_weight. Sharded runs
+are planned on the slice of the shard and runs which merge line segments are planned on the merged lines.
+
+Runtime and memory are estimated from the size of the input files and the number of work units of each algorithm
+using the factors in PLAN_CALIBRATION. The factors can be overridden in the [plan] section of config.toml, for
+example with numbers measured on the machines the jobs run on:
+
+[plan.grid]
+seconds_per_unit = 0.00002
+"""
+
+import os
+import numpy as np
+import geopandas as gpd
+from shapely.geometry import box
+from scripts.grid_generator import read_border_points, grid_axes, geodesic_grid_rows
+from scripts.weight_based import read_weights
+from scripts.shapefile_with_distance import cumulative_geodesic_distances
+from scripts.shapefile_with_weight import clip_lines_to_geography
+from scripts.helpers.utils import METERS_PER_MILE, load_merged_lines, merge_line_segments
+from scripts.helpers.shards import shard_states, states_where_clause
+
+
+PLAN_CALIBRATION = {
+    'input': {'seconds_per_mb': 0.5, 'memory_factor': 6.0},
+    'grid': {'seconds_per_unit': 0.00002, 'bytes_per_unit': 400},
+    'weight_w_num_points': {'seconds_per_unit': 0.0005, 'bytes_per_unit': 200},
+    'weight': {'seconds_per_unit': 0.0004, 'bytes_per_unit': 200},
+    'shapefile_w_distance': {'seconds_per_unit': 0.000005, 'bytes_per_unit': 200},
+    'shapefile_w_weight': {'seconds_per_unit': 0.0002, 'bytes_per_unit': 400},
+}
+
+EQUAL_AREA_CRS = 'EPSG:6933'
+
+
+def calibration_factors(algorithm: str, calibration: dict = None) -> tuple:
+    """
+    Get the input and algorithm factors, overridden by the given calibration.
+
+    :param algorithm: Name of the algorithm.
+    :param calibration: Optional factors in the same format as PLAN_CALIBRATION, usually the [plan] section of config.toml.
+
+    :return: Tuple of (input factors, algorithm factors).
+    """
+    calibration = calibration or {}
+    input_factors = {**PLAN_CALIBRATION['input'], **calibration.get('input', {})}
+    algorithm_factors = {**PLAN_CALIBRATION[algorithm], **calibration.get(algorithm, {})}
+    return input_factors, algorithm_factors
+
+
+def estimate(algorithm: str, points: int, work_units: int, input_files: list, calibration: dict = None) -> dict:
+    """
+    Estimate the runtime and peak memory of a run.
+
+    :param algorithm: Name of the algorithm.
+    :param points: Expected number of generated points.
+    :param work_units: Number of units of work, for example candidate points or line-county pairs.
+    :param input_files: Locations of the input files.
+    :param calibration: Optional factors in the same format as PLAN_CALIBRATION.
+
+    :return: The plan with the expected points, runtime in seconds and peak memory in MB.
+    """
+    input_factors, algorithm_factors = calibration_factors(algorithm, calibration)
+    input_mb = sum(os.path.getsize(file) for file in input_files) / 1e6
+
+    runtime = input_mb * input_factors['seconds_per_mb'] + work_units * algorithm_factors['seconds_per_unit']
+    memory = input_mb * input_factors['memory_factor'] + work_units * algorithm_factors['bytes_per_unit'] / 1e6
+
+    return {
+        'algorithm': algorithm,
+        'points': int(points),
+        'work_units': int(work_units),
+        'runtime_seconds': round(runtime, 1),
+        'peak_memory_mb': round(memory, 1),
+    }
+
+
+def grid_candidate_count(northwestern, southwestern, northeastern, distance, geodesic_spacing=False) -> int:
+    """
+    Count the grid points between the border points without building them.
+
+    :param northwestern: Northwestern border point as (latitude, longitude).
+    :param southwestern: Southwestern border point as (latitude, longitude).
+    :param northeastern: Northeastern border point as (latitude, longitude).
+    :param distance: Distance between the generated dots in miles.
+    :param geodesic_spacing: Count the points of a grid with the true distance between the points.
+
+    :return: Number of grid points before filtering through the shapefile.
+    """
+    if geodesic_spacing:
+        _, _, column_counts = geodesic_grid_rows(northwestern, southwestern, northeastern, distance)
+        return int(column_counts.sum())
+
+    latitudes, longitudes = grid_axes(northwestern, southwestern, northeastern, distance)
+    return len(latitudes) * len(longitudes)
+
+
+def plan_grid(border_points_location_file, shapefile, distances: list, geodesic_spacing=False,
+              calibration: dict = None) -> dict:
+    """
+    Plan a grid run. The expected number of points is the number of grid points multiplied by the share of the
+    border box area which is covered by the shapefile.
+
+    :param border_points_location_file: Points for the northwestern, southwestern, northeastern and southeastern border point
+    :param shapefile: The file path to the shapefile used to filter the generated dots.
+    :param distances: Distances between the generated dots in miles, one grid is planned per distance.
+    :param geodesic_spacing: Plan a grid with the true distance between the points.
+    :param calibration: Optional factors in the same format as PLAN_CALIBRATION.
+
+    :return: The plan.
+    """
+    northwestern, southwestern, northeastern = read_border_points(border_points_location_file)
+
+    border_box = box(northwestern[1], southwestern[0], northeastern[1], northwestern[0])
+    geography = gpd.read_file(shapefile).to_crs('EPSG:4326')
+
+    box_area = gpd.GeoSeries([border_box], crs='EPSG:4326').to_crs(EQUAL_AREA_CRS).area.sum()
+    covered_area = gpd.clip(geography, border_box).to_crs(EQUAL_AREA_CRS).area.sum()
+    covered_share = min(1.0, covered_area / box_area) if box_area else 0.0
+
+    distances = sorted(set(distances))
+    candidates = {distance: grid_candidate_count(northwestern, southwestern, northeastern, distance, geodesic_spacing)
+                  for distance in distances}
+
+    classified = sum(count for distance, count in candidates.items()
+                     if distance == distances[0] or not np.isclose(distance / distances[0], round(distance / distances[0])))
+    points = sum(round(count * covered_share) for count in candidates.values())
+
+    plan = estimate('grid', points, classified, [border_points_location_file, shapefile], calibration)
+    plan['points_per_distance'] = {f'{distance:g}': round(count * covered_share) for distance, count in candidates.items()}
+    return plan
+
+
+def plan_weight_w_num_points(file_name: str, number_of_points: int, calibration: dict = None) -> dict:
+    """
+    Plan a weight_w_num_points run. It always generates the requested number of points.
+
+    :param file_name: Location of the input file containing point data and weight.
+    :param number_of_points: The desired number of points to generate.
+    :param calibration: Optional factors in the same format as PLAN_CALIBRATION.
+
+    :return: The plan.
+    """
+    return estimate('weight_w_num_points', number_of_points, number_of_points, [file_name], calibration)
+
+
+def plan_weight(file_name_with_weights: str, shape_file: str, relation: float, budget: float, max_points: int,
+                calibration: dict = None, shard: tuple = None) -> dict:
+    """
+    Plan a weight run. The number of points is the sum of the optimal number of points of every county, calculated
+    the same way as calculate_optimal_number_of_points.
+
+    :param file_name_with_weights: Location of file which holds weight.
+    :param shape_file: Location of a shape file from which polygons will be extracted.
+    :param relation: The relation value which represents relation between weight and certain enterprise.
+    :param budget: The budget value which represents the budget one want to use when searching for points.
+    :param max_points: The maximum number of establishment that can be scraped for every points selected.
+    :param calibration: Optional factors in the same format as PLAN_CALIBRATION.
+    :param shard: Optional tuple of (index, count) returned by parse_shard, only the shard's states are planned.
+
+    :return: The plan.
+    """
+    weights = read_weights(file_name_with_weights, shard_states(shard) if shard else None)
+
+    number_of_points = np.round(weights['WEIGHT'] * relation / max_points)
+    points = int(np.maximum(1, np.round(number_of_points * budget)).sum())
+
+    return estimate('weight', points, points, [file_name_with_weights, shape_file], calibration)
+
+
+def plan_shapefile_with_distance(input_file: str, distance: float, geodesic_spacing=False,
+                                 calibration: dict = None, merge_columns: list = None) -> dict:
+    """
+    Plan a shapefile_w_distance run. The number of points is the length of every line divided by the distance.
+
+    :param input_file: Path to the input shapefile containing highway data.
+    :param distance: The distance between each interpolated point along the lines.
+    :param geodesic_spacing: Treat the distance as the true distance in miles instead of degrees.
+    :param calibration: Optional factors in the same format as PLAN_CALIBRATION.
+    :param merge_columns: Optional columns by which the run merges line segments. The merged lines are loaded through
+                          the same cache as the run, so the run reuses them.
+
+    :return: The plan.
+    """
+    lines = load_merged_lines(input_file, merge_columns) if merge_columns else gpd.read_file(input_file)
+
+    if geodesic_spacing:
+        _, _, _, cumulative, first, last = cumulative_geodesic_distances(lines.to_crs('EPSG:4326').geometry.values)
+        points = int(((cumulative[last] - cumulative[first]) // (distance * METERS_PER_MILE)).sum())
+    else:
+        points = int((lines.geometry.length // distance).sum())
+
+    return estimate('shapefile_w_distance', points, points, [input_file], calibration)
+
+
+def plan_shapefile_with_weight(input_file: str, shape_file: str, calibration: dict = None, shard: tuple = None,
+                               merge_columns: list = None) -> dict:
+    """
+    Plan a shapefile_w_weight run. Every line gets one point for every county it crosses, so the number of points
+    is the number of line-county pairs left after the lines are clipped to the counties like in the run.
+
+    :param input_file: Path to the input shapefile containing highway data.
+    :param shape_file: Path to the shapefile representing the geographic boundaries.
+    :param calibration: Optional factors in the same format as PLAN_CALIBRATION.
+    :param shard: Optional tuple of (index, count) returned by parse_shard, only the shard's counties and the lines
+                  intersecting them are planned.
+    :param merge_columns: Optional columns by which the run merges line segments.
+
+    :return: The plan.
+    """
+    if shard is None:
+        lines = load_merged_lines(input_file, merge_columns) if merge_columns else gpd.read_file(input_file)
+        geography = gpd.read_file(shape_file)
+    else:
+        geography = gpd.read_file(shape_file, where=states_where_clause(shard_states(shard)))
+        lines = gpd.read_file(input_file, mask=geography)
+        if merge_columns:
+            lines = merge_line_segments(lines, merge_columns)
+
+    pairs = len(clip_lines_to_geography(lines, geography.to_crs(lines.crs)))
+
+    return estimate('shapefile_w_weight', pairs, pairs, [input_file, shape_file], calibration)
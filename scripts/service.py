@@ -0,0 +1,330 @@
+"""
+Point Generator Service
+
+This script starts a long-running local service which loads the county, MSA and roads layers together with the weight
+files once, keeps them and their spatial indexes in memory and serves point generation requests over HTTP with JSON,
+either on a local TCP port or on a Unix socket.
+
+Usage:
+python -m scripts.service --sf <county shapefile> [--rf <roads shapefile>] [--mf <MSA shapefile>] [--wf <weighted file>]
+                          [--pf <weighted points file>] [--merge_by <column> ...] [--conf res/config.toml]
+                          [--port 8000 | --socket <path>]
+
+With --merge_by, contiguous road segments with the same values in the given columns, for example RTTYP FULLNAME, are
+merged once at startup, so shapefile_w_distance and shapefile_w_weight work on whole routes.
+
+Requests are sent as POST /generate with a JSON body:
+{"alg": "grid", "d": 50, "state": "49"}
+
+Parameters per algorithm:
+- 'grid': d - distance between two points in miles
+- 'weight_w_num_points': n - number of points
+- 'weight': r - relation value, b - budget as a number or a name of a budget from the config file
+- 'shapefile_w_distance': d - distance between two points along the lines
+- 'shapefile_w_weight': p - preference for point placement, either larger_weight or smaller_weight
+
+Optional parameters for every algorithm:
+- state: STATEFP code used to filter the layers
+- bbox: [min_lon, min_lat, max_lon, max_lat] used to filter the layers
+- msa: true to keep only the points inside the metropolitan statistical areas
+- geodesic: true to place the points of grid and shapefile_w_distance at the true distance in miles apart
+
+The response is {"points": [[latitude, longitude], ...]}.
+"""
+
+import argparse
+import http.server
+import json
+import os
+import socketserver
+import numpy as np
+import geopandas as gpd
+import toml
+from shapely.geometry import box
+from scripts.grid_generator import grid_inside_geography
+from scripts.weight_based_fixed_point_nr import read_weighted_points, select_weighted_points
+from scripts.weight_based import read_weights, generate_weight_based_points
+from scripts.shapefile_with_distance import points_on_line_with_distance, points_on_line_with_geodesic_distance
+from scripts.shapefile_with_weight import weighted_points_on_lines
+from scripts.helpers.utils import coordinates_to_points, points_to_coordinates, merge_line_segments, points_in_msa
+
+
+class Datasets:
+    """
+    Layers and weight files loaded once and shared, read-only, between all requests.
+
+    Spatial indexes are built while loading, so request threads never build them concurrently.
+    """
+
+    def __init__(self, county_file: str, roads_file: str = None, msa_file: str = None, weights_file: str = None,
+                 weighted_points_file: str = None, config_file: str = 'res/config.toml', merge_columns: list = None):
+        self.config = toml.load(config_file)
+
+        self.counties = gpd.read_file(county_file).to_crs('EPSG:4326')
+        self.counties_3857 = self.counties.to_crs('EPSG:3857')
+        self.roads = gpd.read_file(roads_file).to_crs('EPSG:4326') if roads_file else None
+        if self.roads is not None and merge_columns:
+            self.roads = merge_line_segments(self.roads, merge_columns)
+        self.msa = gpd.read_file(msa_file).to_crs('EPSG:4326') if msa_file else None
+        self.weights = read_weights(weights_file) if weights_file else None
+        self.weighted_points = read_weighted_points(weighted_points_file) if weighted_points_file else None
+
+        for layer in (self.counties, self.roads, self.msa):
+            if layer is not None:
+                layer.sindex
+
+        self.county_state_positions = self.counties.groupby('STATEFP').indices
+
+    def state_bounds(self, state: str) -> tuple:
+        """
+        Get the bounding box of a state.
+
+        :param state: STATEFP code of the state.
+
+        :return: Tuple of (min_lon, min_lat, max_lon, max_lat).
+        """
+        return tuple(self.counties.iloc[self.county_positions(state)].total_bounds)
+
+    def county_positions(self, state: str = None, bbox: list = None) -> np.ndarray:
+        """
+        Find the counties of a state and inside a bounding box without building new spatial indexes.
+
+        :param state: STATEFP code of the state.
+        :param bbox: [min_lon, min_lat, max_lon, max_lat].
+
+        :return: Sorted positions of the counties in the county layers.
+        """
+        positions = np.arange(len(self.counties))
+        if state is not None:
+            positions = self.county_state_positions.get(state, np.array([], dtype=int))
+        return intersect_bbox(self.counties, positions, bbox)
+
+
+def required_layer(layer, name: str):
+    """
+    Check that a layer needed by the algorithm was loaded when the service was started.
+
+    :param layer: The loaded layer or None.
+    :param name: Name of the command line option which loads the layer.
+
+    :return: The layer.
+    """
+    if layer is None:
+        raise ValueError(f"The service was started without {name}, which is required by this algorithm.")
+    return layer
+
+
+def intersect_bbox(layer: gpd.GeoDataFrame, positions: np.ndarray, bbox: list = None) -> np.ndarray:
+    """
+    Keep only the positions of the features whose bounds intersect the bounding box, using the layer's prebuilt
+    spatial index.
+
+    :param layer: GeoDataFrame in EPSG:4326 with a built spatial index.
+    :param positions: Positions of the features to filter.
+    :param bbox: [min_lon, min_lat, max_lon, max_lat].
+
+    :return: Sorted positions of the kept features.
+    """
+    if bbox is None:
+        return positions
+    return np.intersect1d(positions, layer.sindex.query(box(*bbox)))
+
+
+def bbox_layer(layer: gpd.GeoDataFrame, bbox: list = None) -> gpd.GeoDataFrame:
+    """
+    Filter a layer in EPSG:4326 by bounding box.
+
+    :param layer: GeoDataFrame in EPSG:4326 with a built spatial index.
+    :param bbox: [min_lon, min_lat, max_lon, max_lat].
+
+    :return: The filtered GeoDataFrame.
+    """
+    if bbox is None:
+        return layer
+    return layer.iloc[intersect_bbox(layer, np.arange(len(layer)), bbox)]
+
+
+def filter_table(table, state: str = None, bbox: list = None):
+    """
+    Filter a weight table by state and bounding box using its STATEFP, LATITUDE and LONGITUDE columns.
+
+    :param table: DataFrame with LATITUDE and LONGITUDE columns.
+    :param state: STATEFP code, applied only when the table has a STATEFP column.
+    :param bbox: [min_lon, min_lat, max_lon, max_lat].
+
+    :return: The filtered DataFrame.
+    """
+    if state is not None and 'STATEFP' in table:
+        table = table[table['STATEFP'] == state]
+    if bbox is not None:
+        min_lon, min_lat, max_lon, max_lat = bbox
+        table = table[table['LONGITUDE'].between(min_lon, max_lon) & table['LATITUDE'].between(min_lat, max_lat)]
+    return table
+
+
+def number_parameter(value, name: str, parse=float, allow_zero: bool = False):
+    """
+    Convert a numeric parameter of the request and check that it is positive, or not negative when zero is allowed.
+
+    :param value: Value of the parameter from the request.
+    :param name: Name of the parameter, used in the error message.
+    :param parse: Type the parameter is converted to, float or int.
+    :param allow_zero: Accept zero as a valid value.
+
+    :return: The converted value.
+    """
+    value = parse(value)
+    if not np.isfinite(value) or value < 0 or (value == 0 and not allow_zero):
+        requirement = 'a non-negative' if allow_zero else 'a positive'
+        raise ValueError(f"Parameter '{name}' must be {requirement} number.")
+    return value
+
+
+def generate(datasets: Datasets, request: dict) -> list:
+    """
+    Run the requested algorithm on the loaded datasets.
+
+    :param datasets: The loaded datasets.
+    :param request: Parameters of the request, see the module documentation.
+
+    :return: A list of (latitude, longitude) pairs.
+    """
+    alg = request.get('alg')
+    state = request.get('state')
+    bbox = request.get('bbox')
+
+    if alg == 'grid':
+        geography = datasets.counties.iloc[datasets.county_positions(state, bbox)]
+        min_lon, min_lat, max_lon, max_lat = bbox if bbox is not None else geography.total_bounds
+        points = grid_inside_geography((max_lat, min_lon), (min_lat, min_lon), (max_lat, max_lon), geography,
+                                       number_parameter(request['d'], 'd'), bool(request.get('geodesic')))
+        points = [tuple(point) for point in points]
+    elif alg == 'weight_w_num_points':
+        weighted_points = required_layer(datasets.weighted_points, '--pf')
+        if state is not None and bbox is None:
+            bbox = datasets.state_bounds(state)
+        selected_points = select_weighted_points(filter_table(weighted_points, bbox=bbox),
+                                                 number_parameter(request['n'], 'n', int, allow_zero=True))
+        points = [tuple(point) for point in selected_points[['LATITUDE', 'LONGITUDE']].values]
+    elif alg == 'weight':
+        weights = filter_table(required_layer(datasets.weights, '--wf'), state, bbox)
+        county_polygons = datasets.counties_3857.iloc[datasets.county_positions(state, bbox)]
+        relation = number_parameter(request['r'], 'r', allow_zero=True)
+        budget = number_parameter(datasets.config['budget'].get(request['b'], request['b']), 'b', allow_zero=True)
+        points = generate_weight_based_points(weights, county_polygons, relation, budget,
+                                              datasets.config['config']['max_num_per_screen'])
+        points = [tuple(point) for point in points]
+    elif alg == 'shapefile_w_distance':
+        if state is not None and bbox is None:
+            bbox = datasets.state_bounds(state)
+        lines = bbox_layer(required_layer(datasets.roads, '--rf'), bbox)
+        distance = number_parameter(request['d'], 'd')
+        if request.get('geodesic'):
+            points = points_on_line_with_geodesic_distance(lines, distance)
+        else:
+            points = points_on_line_with_distance(lines, distance)
+    elif alg == 'shapefile_w_weight':
+        geography = datasets.counties.iloc[datasets.county_positions(state, bbox)]
+        if bbox is None:
+            bbox = geography.total_bounds
+        lines = bbox_layer(required_layer(datasets.roads, '--rf'), bbox)
+        points = weighted_points_on_lines(lines, geography, request['p'])
+    else:
+        raise ValueError(f"Invalid algorithm choice: {alg}")
+
+    if request.get('msa'):
+        msa = required_layer(datasets.msa, '--mf')
+        points = points_to_coordinates(points_in_msa(coordinates_to_points(points), msa))
+
+    return points
+
+
+class GenerationRequestHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Handles POST /generate requests. The loaded datasets are available through the server.
+    """
+
+    def do_POST(self):
+        if self.path != '/generate':
+            self.send_json(404, {'error': f"Unknown path: {self.path}"})
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length))
+            if not isinstance(request, dict):
+                raise ValueError("Request body must be a JSON object.")
+            points = generate(self.server.datasets, request)
+            points = [[float(latitude), float(longitude)] for latitude, longitude in points]
+        except (json.decoder.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+            self.send_json(400, {'error': f"Invalid request: {e}"})
+            return
+        except Exception as e:
+            self.log_error("Generation failed: %r", e)
+            self.send_json(500, {'error': f"Generation failed: {e}"})
+            return
+
+        self.send_json(200, {'points': points})
+
+    def send_json(self, status: int, body: dict):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def address_string(self):
+        if isinstance(self.client_address, tuple):
+            return super().address_string()
+        return 'unix-socket'
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(datasets: Datasets, port: int = 8000, socket_path: str = None):
+    """
+    Serve generation requests until interrupted.
+
+    :param datasets: The loaded datasets.
+    :param port: Local TCP port, used when socket_path is not given.
+    :param socket_path: Path of the Unix socket to listen on.
+    """
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = ThreadingUnixHTTPServer(socket_path, GenerationRequestHandler)
+    else:
+        server = http.server.ThreadingHTTPServer(('127.0.0.1', port), GenerationRequestHandler)
+
+    server.datasets = datasets
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if socket_path and os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('--sf', help='Location of the county shape file', type=str, required=True)
+    parser.add_argument('--rf', help='Location of the roads shape file', type=str)
+    parser.add_argument('--mf', help='Location of the MSA shape file', type=str)
+    parser.add_argument('--wf', help='Location of the weighted file used by weight', type=str)
+    parser.add_argument('--pf', help='Location of the weighted file used by weight_w_num_points', type=str)
+    parser.add_argument('--merge_by', help='Merge contiguous road segments with the same values in these columns', type=str, nargs='+')
+    parser.add_argument('--conf', help='Path to the TOML configuration file', type=str, default='res/config.toml')
+    parser.add_argument('--port', help='Local port to listen on', type=int, default=8000)
+    parser.add_argument('--socket', help='Path of the Unix socket to listen on instead of the port', type=str)
+
+    args = parser.parse_args()
+
+    loaded_datasets = Datasets(args.sf, args.rf, args.mf, args.wf, args.pf, args.conf, args.merge_by)
+    serve(loaded_datasets, args.port, args.socket)
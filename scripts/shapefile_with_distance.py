@@ -1,6 +1,8 @@
+import numpy as np
 import geopandas as gpd
+import shapely
 from scripts.helpers.utils import save_coordinates_to_csv as sccsv
-from scripts.helpers.utils import filter_shapefile_by_parameters as filter_shapefile
+from scripts.helpers.utils import load_merged_lines, GEOD, METERS_PER_MILE
 
 
 def points_on_line_with_distance(lines: gpd.GeoDataFrame, distance: float) -> list:
@@ -15,25 +17,95 @@ def points_on_line_with_distance(lines: gpd.GeoDataFrame, distance: float) -> li
     Returns:
         list: A list of tuples containing (latitude, longitude) pairs representing the generated points.
     """
-    points_on_line = []
+    x, y = interpolate_points_on_lines(lines.geometry.values, distance)
 
-    for _, line in lines.iterrows():
-        total_distance = line['geometry'].length
+    return list(zip(y, x))
 
-        if total_distance < distance:
-            continue
 
-        num_interpolated_points = int(total_distance // distance)
+def interpolate_points_on_lines(geometries, distance: float) -> tuple:
+    """
+    Interpolate points along every line at the specified distance, for all lines at once.
+
+    Parameters:
+        geometries (array): Array of line geometries.
+        distance (float): The distance between each interpolated point along the lines, in units of the geometries.
+
+    Returns:
+        tuple: Arrays of x and y coordinates of the interpolated points, ordered by line and by distance along it.
+    """
+    geometries = np.asarray(geometries)
+    counts = (shapely.length(geometries) // distance).astype(int)
+
+    line_index = np.repeat(np.arange(len(geometries)), counts)
+    position = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + 1
+
+    points = shapely.line_interpolate_point(geometries[line_index], position * distance)
+    return shapely.get_x(points), shapely.get_y(points)
+
+
+def cumulative_geodesic_distances(geometries) -> tuple:
+    """
+    Measure the geodesic distance from the start of every line to each of its vertices, for all lines at once. The
+    parts of multi-part lines are measured as separate lines.
+
+    Parameters:
+        geometries (array): Array of line geometries in EPSG:4326.
+
+    Returns:
+        tuple: Arrays of vertex longitudes, vertex latitudes, forward azimuths of the segments starting at every
+               vertex, cumulative distances in metres at every vertex, and the positions of the first and last
+               vertex of every line. Cumulative distances continue from one line to the next, so the length of a
+               line is the difference between the distances at its last and first vertex.
+    """
+    parts = shapely.get_parts(np.asarray(geometries))
+    parts = parts[shapely.get_num_coordinates(parts) > 1]
+
+    coordinates, vertex_line = shapely.get_coordinates(parts, return_index=True)
+    longitudes, latitudes = coordinates[:, 0], coordinates[:, 1]
+
+    azimuths, _, segment_lengths = GEOD.inv(longitudes[:-1], latitudes[:-1], longitudes[1:], latitudes[1:])
+    segment_lengths = np.where(vertex_line[1:] == vertex_line[:-1], segment_lengths, 0)
+    cumulative = np.concatenate([[0.0], np.cumsum(segment_lengths)])
+
+    lines = np.arange(len(parts))
+    first = np.searchsorted(vertex_line, lines, side='left')
+    last = np.searchsorted(vertex_line, lines, side='right') - 1
+
+    return longitudes, latitudes, np.asarray(azimuths), cumulative, first, last
+
+
+def points_on_line_with_geodesic_distance(lines: gpd.GeoDataFrame, distance: float) -> list:
+    """
+    Generate points along each line at the true distance in miles. Distances are measured on the ellipsoid along
+    the vertices of every line, and every point is placed on the geodesic segment which contains it.
+
+    Parameters:
+        lines (GeoDataFrame): A GeoDataFrame containing lines represented by their geometries in EPSG:4326.
+        distance (float): The distance between each interpolated point along the lines, in miles.
+
+    Returns:
+        list: A list of tuples containing (latitude, longitude) pairs representing the generated points.
+    """
+    longitudes, latitudes, azimuths, cumulative, first, last = cumulative_geodesic_distances(lines.geometry.values)
+    if len(first) == 0:
+        return []
+
+    step = distance * METERS_PER_MILE
+    counts = ((cumulative[last] - cumulative[first]) // step).astype(int)
+
+    line_index = np.repeat(np.arange(len(counts)), counts)
+    position = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + 1
+    targets = cumulative[first][line_index] + position * step
 
-        interpolated_points = [line['geometry'].interpolate(i * distance) for i in range(1, num_interpolated_points + 1)]
+    vertex = np.clip(np.searchsorted(cumulative, targets, side='left'), first[line_index] + 1, last[line_index]) - 1
 
-        for point in interpolated_points:
-            points_on_line.append((point.y, point.x))
+    point_longitudes, point_latitudes, _ = GEOD.fwd(longitudes[vertex], latitudes[vertex], azimuths[vertex],
+                                                    targets - cumulative[vertex])
 
-    return points_on_line
+    return list(zip(point_latitudes, point_longitudes))
 
 
-def shapefile_with_distance(input_file, output_file, distance):
+def shapefile_with_distance(input_file, output_file, distance, geodesic_spacing=False, merge_columns=None):
     """
     Process a shapefile, filter specific highway codes, generate points along the lines, and save them to a CSV file.
 
@@ -41,12 +113,22 @@ def shapefile_with_distance(input_file, output_file, distance):
         input_file (str): Path to the input shapefile containing highway data.
         output_file (str): Path to the output CSV file where the points will be saved.
         distance (float): The distance between each interpolated point along the lines.
+        geodesic_spacing (bool): Treat the distance as the true distance in miles instead of degrees.
+        merge_columns (list): Optional columns, for example ['RTTYP', 'FULLNAME']. Contiguous segments with the same
+                              values in them are merged first and cached next to the input file.
 
     Returns:
         None
     """
-    lines = gpd.read_file(input_file)
-    points = points_on_line_with_distance(lines, distance)
+    if merge_columns:
+        lines = load_merged_lines(input_file, merge_columns)
+    else:
+        lines = gpd.read_file(input_file)
+
+    if geodesic_spacing:
+        points = points_on_line_with_geodesic_distance(lines.to_crs('EPSG:4326'), distance)
+    else:
+        points = points_on_line_with_distance(lines, distance)
     sccsv(points, output_file)
 
 
@@ -55,7 +137,7 @@ if __name__ == '__main__':
     output_location_file = '../res/output.csv'
 
     filtering_parameters = ('RTTYP', ['I', 'U', 'S'])
-    filter_shapefile(lines_location_file, filtering_parameters, "filtered_shapefile.zip")
+    roads = load_merged_lines(lines_location_file, ['RTTYP', 'FULLNAME'], filtering_parameters)
 
     length = 0.001
-    shapefile_with_distance('../scripts/filtered_shapefile.zip', output_location_file, length)
+    sccsv(points_on_line_with_distance(roads, length), output_location_file)
@@ -2,7 +2,8 @@ import geopandas as gpd
 import pandas as pd
 import pyproj
 from scripts.helpers.utils import save_coordinates_to_csv as sccsv
-from scripts.helpers.utils import filter_shapefile_by_parameters as filter_shapefile
+from scripts.helpers.utils import load_merged_lines, merge_line_segments
+from scripts.helpers.shards import shard_states, states_where_clause, write_partial_output
 
 
 def generate_points_on_line(lines: gpd.GeoDataFrame) -> list:
@@ -63,30 +64,50 @@ def define_weight_preference(preference: str, line: pd.Series) -> float:
     return weight_preference
 
 
-def shapefile_with_weight(input_file: str, shape_file: str, output_file: str, preference: str):
+def clip_lines_to_geography(lines: gpd.GeoDataFrame, geography: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
     """
-    Process shapefiles, calculate weights, generate points, and export to a CSV file.
+    Clip every line to each county it intersects. Pairs which only touch the county border are dropped.
 
     Parameters:
-        input_file (str): Path to the input shapefile containing highway data.
-        shape_file (str): Path to the shapefile representing the geographic boundaries.
-        output_file (str): Path to the output CSV file where the points will be saved.
-        preference (str): User's preference for point placement, either 'larger_weight' or 'smaller_weight'.
+        lines (GeoDataFrame): A GeoDataFrame containing highway lines.
+        geography (GeoDataFrame): A GeoDataFrame representing the geographic boundaries, in the CRS of the lines.
 
     Returns:
-        None
+        GeoDataFrame: One row per line-county pair with the piece of the line inside the county and the columns of
+                      both layers.
+    """
+    lines_in_geography = gpd.sjoin(lines, geography, how='inner', predicate='intersects')
+
+    county_geometries = gpd.GeoSeries(geography.geometry.loc[lines_in_geography['index_right']].values,
+                                      index=lines_in_geography.index, crs=lines_in_geography.crs)
+    lines_in_geography = lines_in_geography.set_geometry(
+        lines_in_geography.geometry.intersection(county_geometries, align=False))
+
+    return lines_in_geography[
+        lines_in_geography.geom_type.isin(['LineString', 'MultiLineString']) & ~lines_in_geography.is_empty].copy()
+
+
+def weighted_points_on_lines(lines: gpd.GeoDataFrame, geography: gpd.GeoDataFrame, preference: str) -> list:
     """
-    lines = gpd.read_file(input_file)
+    Calculate weights of already loaded lines and generate points along them. Every line is clipped to each county it
+    intersects, so a line crossing several counties, for example a merged route, gets its points on its piece inside
+    every county instead of at the same place for every county.
 
-    geography = gpd.read_file(shape_file)
+    Parameters:
+        lines (GeoDataFrame): A GeoDataFrame containing highway lines.
+        geography (GeoDataFrame): A GeoDataFrame representing the geographic boundaries.
+        preference (str): User's preference for point placement, either 'larger_weight' or 'smaller_weight'.
 
+    Returns:
+        list: A list of tuples containing (latitude, longitude) pairs representing the generated points.
+    """
     lines = lines.to_crs('EPSG:32633')
     geography = geography.to_crs(crs=lines.crs)
 
     geography['county_area'] = geography.geometry.area
-    lines['line_length'] = lines.geometry.length
 
-    lines_in_geography = gpd.sjoin(lines, geography, how='inner', predicate='intersects')
+    lines_in_geography = clip_lines_to_geography(lines, geography)
+    lines_in_geography['line_length'] = lines_in_geography.geometry.length
 
     lines_in_geography['weight'] = lines_in_geography['line_length'] / lines_in_geography['county_area']
 
@@ -95,8 +116,11 @@ def shapefile_with_weight(input_file: str, shape_file: str, output_file: str, pr
     min_weight = weight_preference.min()
     max_weight = weight_preference.max()
 
-    lines_in_geography['num_points'] = (
-        (1 - (weight_preference - min_weight) / (max_weight - min_weight))).astype(int)
+    if max_weight == min_weight:
+        lines_in_geography['num_points'] = 1
+    else:
+        lines_in_geography['num_points'] = (
+            (1 - (weight_preference - min_weight) / (max_weight - min_weight))).astype(int)
 
     lines_in_geography.loc[lines_in_geography['num_points'] == 0, 'num_points'] = 1
 
@@ -104,12 +128,53 @@ def shapefile_with_weight(input_file: str, shape_file: str, output_file: str, pr
 
     transformer = pyproj.Transformer.from_crs('EPSG:32633', 'EPSG:4326', always_xy=True)
 
-    transformed_points = []
-    for point in points:
-        lon, lat = transformer.transform(point[1], point[0])
-        transformed_points.append((lat, lon))
+    lon, lat = transformer.transform([point[1] for point in points], [point[0] for point in points])
+
+    return list(zip(lat, lon))
+
+
+def shapefile_with_weight(input_file: str, shape_file: str, output_file: str, preference: str, shard: tuple = None,
+                          merge_columns: list = None):
+    """
+    Process shapefiles, calculate weights, generate points, and export to a CSV file.
+
+    Parameters:
+        input_file (str): Path to the input shapefile containing highway data.
+        shape_file (str): Path to the shapefile representing the geographic boundaries.
+        output_file (str): Path to the output CSV file where the points will be saved.
+        preference (str): User's preference for point placement, either 'larger_weight' or 'smaller_weight'.
+        shard (tuple): Optional (index, count) returned by parse_shard. Only the counties of the shard's states and
+                       the lines intersecting them are loaded, and a partial output is written. A line crossing a
+                       shard border is loaded by both shards, but each of its line-county pairs is generated only
+                       by the shard which owns the county, so it is counted exactly once after merging.
+        merge_columns (list): Optional columns, for example ['RTTYP', 'FULLNAME']. Contiguous segments with the same
+                              values in them are merged first. Without a shard the merged lines are cached next
+                              to the input file, a shard merges only the lines it loaded.
+
+    Returns:
+        None
+    """
+    if shard is None:
+        if merge_columns:
+            lines = load_merged_lines(input_file, merge_columns)
+        else:
+            lines = gpd.read_file(input_file)
+        geography = gpd.read_file(shape_file)
+        sccsv(weighted_points_on_lines(lines, geography, preference), output_file)
+        return
+
+    geography = gpd.read_file(shape_file, where=states_where_clause(shard_states(shard)))
+    states = sorted(geography['STATEFP'].unique())
+
+    points = []
+    if not geography.empty:
+        lines = gpd.read_file(input_file, mask=geography)
+        if merge_columns:
+            lines = merge_line_segments(lines, merge_columns)
+        points = weighted_points_on_lines(lines, geography, preference)
 
-    sccsv(transformed_points, output_file)
+    write_partial_output(points, output_file, shard, 'shapefile_w_weight', states,
+                         {'preference': preference, 'merge_columns': merge_columns})
 
 
 if __name__ == '__main__':
@@ -120,6 +185,7 @@ if __name__ == '__main__':
     position_preference = "smaller_weight"
 
     filtering_parameters = ('RTTYP', ['I', 'U', 'S'])
-    filtered_shapefile = filter_shapefile(lines_location_file, filtering_parameters, "filtered_shapefile.zip")
+    roads = load_merged_lines(lines_location_file, ['RTTYP', 'FULLNAME'], filtering_parameters)
+    counties = gpd.read_file(geography_location_file)
 
-    shapefile_with_weight('../scripts/filtered_shapefile.zip', geography_location_file, output_location_file, position_preference)
+    sccsv(weighted_points_on_lines(roads, counties, position_preference), output_location_file)
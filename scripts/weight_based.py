@@ -6,6 +6,7 @@ import geopandas as gpd
 from pyproj import Transformer
 from scripts.helpers.utils import save_coordinates_to_csv as sccsv
 from scripts.helpers.helpers import column_descriptions
+from scripts.helpers.shards import shard_states, states_where_clause, write_partial_output
 
 
 def calculate_optimal_number_of_points(weight: int, relation: float, budget: float, max_point_count: int) -> int:
@@ -65,28 +66,44 @@ def reading_file_error(key_error):
             print(f"Missing column: {column}\nDescription: Description not available.\n")
 
 
-def weight_based(file_name_with_weights: str, output_file: str, shape_file: str, relation: float, budget: float,
-                 max_points: int):
+def read_weights(file_name_with_weights: str, states: list = None, chunk_size: int = 100000) -> pd.DataFrame:
     """
-        Generate points that will cover all establishment in each county based on parameters.
+        Read the file which holds weight.
 
         :param file_name_with_weights: Location of file which holds weight.
-        :param output_file: Location of a file in which point will be saved.
-        :param shape_file: Location of a shape file from which polygons will be extracted.
-        :param relation: The relation value which represents relation between weight and certain enterprise. Ex. number of grocery stored per one citizen.
-        :param budget: The budget value which represents the budget one want to use when searching for points. Budget is directly related to the percentage of points that will be used. Percentage of weight can be modified in the config.toml file.
-        :param max_points: The maximum number of establishment that can be scraped for every points selected. It can be altered in config.toml file.
+        :param states: Optional STATEFP codes. When given, the file is read in chunks and only the rows of these states are kept.
+        :param chunk_size: The number of rows read at once when states are given.
 
+        :return: DataFrame with STATEFP, COUNTYFP, WEIGHT, LATITUDE and LONGITUDE columns.
         """
+    columns = ['STATEFP', 'COUNTYFP', 'WEIGHT', 'LATITUDE', 'LONGITUDE']
+    dtype = {'Population': int, 'STATEFP': str, 'COUNTYFP': str}
     try:
-        weights = pd.read_csv(file_name_with_weights, dtype={'Population': int, 'STATEFP': str, 'COUNTYFP': str}).loc[:, ['STATEFP', 'COUNTYFP', 'WEIGHT', 'LATITUDE', 'LONGITUDE']]
+        if states is None:
+            return pd.read_csv(file_name_with_weights, dtype=dtype).loc[:, columns]
+
+        chunks = pd.read_csv(file_name_with_weights, dtype=dtype, chunksize=chunk_size)
+        return pd.concat([chunk.loc[chunk['STATEFP'].isin(states), columns] for chunk in chunks], ignore_index=True)
     except KeyError as e:
         reading_file_error(e)
         sys.exit()
 
-    weights['Optimal Number of Points'] = weights.apply(lambda row_points: calculate_optimal_number_of_points(row_points['WEIGHT'], relation, budget, max_points), axis=1)
 
-    county_polygons = gpd.read_file(shape_file)
+def generate_weight_based_points(weights: pd.DataFrame, county_polygons: gpd.GeoDataFrame, relation: float,
+                                 budget: float, max_points: int) -> list:
+    """
+        Generate points that will cover all establishment in each county of already loaded data.
+
+        :param weights: DataFrame returned by read_weights.
+        :param county_polygons: GeoDataFrame with county polygons in EPSG:3857 and STATEFP and COUNTYFP columns.
+        :param relation: The relation value which represents relation between weight and certain enterprise. Ex. number of grocery stored per one citizen.
+        :param budget: The budget value which represents the budget one want to use when searching for points.
+        :param max_points: The maximum number of establishment that can be scraped for every points selected.
+
+        :return: A list of (latitude, longitude) pairs.
+        """
+    weights = weights.copy()
+    weights['Optimal Number of Points'] = weights.apply(lambda row_points: calculate_optimal_number_of_points(row_points['WEIGHT'], relation, budget, max_points), axis=1)
 
     generated_points = []
 
@@ -102,7 +119,38 @@ def weight_based(file_name_with_weights: str, output_file: str, shape_file: str,
 
         generated_points.extend([[point.x, point.y] for point in random_points])
 
-    sccsv(generated_points, output_file)
+    return generated_points
+
+
+def weight_based(file_name_with_weights: str, output_file: str, shape_file: str, relation: float, budget: float,
+                 max_points: int, shard: tuple = None):
+    """
+        Generate points that will cover all establishment in each county based on parameters.
+
+        :param file_name_with_weights: Location of file which holds weight.
+        :param output_file: Location of a file in which point will be saved.
+        :param shape_file: Location of a shape file from which polygons will be extracted.
+        :param relation: The relation value which represents relation between weight and certain enterprise. Ex. number of grocery stored per one citizen.
+        :param budget: The budget value which represents the budget one want to use when searching for points. Budget is directly related to the percentage of points that will be used. Percentage of weight can be modified in the config.toml file.
+        :param max_points: The maximum number of establishment that can be scraped for every points selected. It can be altered in config.toml file.
+        :param shard: Optional tuple of (index, count) returned by parse_shard. Only the rows and counties of the shard's states are read and a partial output is written.
+
+        """
+    if shard is None:
+        weights = read_weights(file_name_with_weights)
+        county_polygons = gpd.read_file(shape_file)
+        sccsv(generate_weight_based_points(weights, county_polygons, relation, budget, max_points), output_file)
+    else:
+        weights = read_weights(file_name_with_weights, shard_states(shard))
+        states = sorted(weights['STATEFP'].unique())
+
+        generated_points = []
+        if states:
+            county_polygons = gpd.read_file(shape_file, where=states_where_clause(states))
+            generated_points = generate_weight_based_points(weights, county_polygons, relation, budget, max_points)
+
+        parameters = {'relation': relation, 'budget': budget, 'max_points': max_points}
+        write_partial_output(generated_points, output_file, shard, 'weight', states, parameters)
 
 
 if __name__ == '__main__':
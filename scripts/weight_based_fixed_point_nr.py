@@ -20,47 +20,103 @@ def move_point_by_rand(latitude: float, longitude: float) -> Tuple[float, float]
     return latitude, longitude
 
 
-def weight_based_generator(file_name: str, output_file: str, number_of_points: int):
+def read_weighted_points(file_name: str) -> pd.DataFrame:
     """
-    Generate points based on the weight of each point in the input file.
+    Read the input file containing point data and weight.
 
     :param file_name: Location of the input file containing point data and weight.
-    :param output_file: Location of the output file to save the generated points.
-    :param number_of_points: The desired number of points to generate.
+    :return: DataFrame with POPULATION, LATITUDE and LONGITUDE columns.
+    """
+    column_names = ['POPULATION', 'LATITUDE', 'LONGITUDE']
+    return pd.read_csv(file_name, skiprows=1, usecols=[6, 7, 8], names=column_names)
+
+
+def read_top_weighted_points(file_name: str, number_of_points: int, chunk_size: int = 100000) -> pd.DataFrame:
     """
+    Read the input file in chunks and keep only the points with the largest weight.
 
+    Rows of a chunk which are not heavier than the current smallest kept weight are dropped before they are added, so
+    only the current top points and one chunk are held in memory and the file is scanned once without sorting it.
+
+    :param file_name: Location of the input file containing point data and weight.
+    :param number_of_points: The number of points with the largest weight to keep.
+    :param chunk_size: The number of rows read at once.
+    :return: DataFrame with the kept points, every point of the file when it has fewer rows than number_of_points.
+    """
     column_names = ['POPULATION', 'LATITUDE', 'LONGITUDE']
-    sorted_points_df = pd.read_csv(file_name, skiprows=1, usecols=[6, 7, 8], names=column_names).sort_values(by='POPULATION', ascending=False)
+    top_points = pd.DataFrame(columns=column_names)
+    threshold = None
+
+    for chunk in pd.read_csv(file_name, skiprows=1, usecols=[6, 7, 8], names=column_names, chunksize=chunk_size):
+        if threshold is not None:
+            chunk = chunk[chunk['POPULATION'] > threshold]
+        if chunk.empty:
+            continue
+
+        top_points = pd.concat([top_points, chunk], ignore_index=True) if len(top_points) else chunk
+
+        if len(top_points) > number_of_points:
+            top_points = top_points.nlargest(number_of_points, 'POPULATION')
+            threshold = top_points['POPULATION'].min()
+
+    return top_points.reset_index(drop=True)
+
+
+def select_weighted_points(points_df: pd.DataFrame, number_of_points: int) -> pd.DataFrame:
+    """
+    Select points based on the weight of each point in already loaded point data.
+
+    :param points_df: DataFrame returned by read_weighted_points.
+    :param number_of_points: The desired number of points to generate.
+    :return: DataFrame with the selected points in the LATITUDE and LONGITUDE columns.
+    """
+    if number_of_points <= len(points_df):
+        return points_df.nlargest(number_of_points, 'POPULATION')
+
+    sorted_points_df = points_df.sort_values(by='POPULATION', ascending=False)
 
     sorted_points_df_length = len(sorted_points_df)
 
-    if number_of_points <= sorted_points_df_length:
-        selected_points = sorted_points_df.head(number_of_points)
-    else:
-        selected_points = sorted_points_df.head(sorted_points_df_length)
-        total_population = sorted_points_df['POPULATION'].sum()
+    selected_points = sorted_points_df.head(sorted_points_df_length)
+    total_population = sorted_points_df['POPULATION'].sum()
+
+    sorted_points_df['Population Percentage'] = round((sorted_points_df['POPULATION'] / total_population) * 100)
+    sorted_points_df['Allocated Points'] = round((sorted_points_df['Population Percentage'] / 100) * (number_of_points - sorted_points_df_length))
+
+    for index, row in sorted_points_df.iterrows():
+        for i in range(int(round(row['Allocated Points']))):
+            latitude, longitude = move_point_by_rand(row['LATITUDE'], row['LONGITUDE'])
+            altered_row = pd.Series([latitude, longitude], index=['LATITUDE', 'LONGITUDE'])
+            selected_points = selected_points._append(altered_row, ignore_index=True)
 
-        sorted_points_df['Population Percentage'] = round((sorted_points_df['POPULATION'] / total_population) * 100)
-        sorted_points_df['Allocated Points'] = round((sorted_points_df['Population Percentage'] / 100) * (number_of_points - sorted_points_df_length))
+    points_used = sorted_points_df['Allocated Points'].sum() + sorted_points_df_length
+    points_left = number_of_points - points_used
 
+    if points_left > 0:
         for index, row in sorted_points_df.iterrows():
-            for i in range(int(round(row['Allocated Points']))):
-                latitude, longitude = move_point_by_rand(row['LATITUDE'], row['LONGITUDE'])
-                altered_row = pd.Series([latitude, longitude], index=['LATITUDE', 'LONGITUDE'])
-                selected_points = selected_points._append(altered_row, ignore_index=True)
-
-        points_used = sorted_points_df['Allocated Points'].sum() + sorted_points_df_length
-        points_left = number_of_points - points_used
-
-        if points_left > 0:
-            for index, row in sorted_points_df.iterrows():
-                latitude, longitude = move_point_by_rand(row['LATITUDE'], row['LONGITUDE'])
-                altered_row = pd.Series([latitude, longitude], index=['LATITUDE', 'LONGITUDE'])
-                selected_points = selected_points._append(altered_row, ignore_index=True)
-
-                points_left -= 1
-                if points_left == 0:
-                    break
+            latitude, longitude = move_point_by_rand(row['LATITUDE'], row['LONGITUDE'])
+            altered_row = pd.Series([latitude, longitude], index=['LATITUDE', 'LONGITUDE'])
+            selected_points = selected_points._append(altered_row, ignore_index=True)
+
+            points_left -= 1
+            if points_left == 0:
+                break
+
+    return selected_points
+
+
+def weight_based_generator(file_name: str, output_file: str, number_of_points: int):
+    """
+    Generate points based on the weight of each point in the input file.
+
+    :param file_name: Location of the input file containing point data and weight.
+    :param output_file: Location of the output file to save the generated points.
+    :param number_of_points: The desired number of points to generate.
+    """
+
+    top_points = read_top_weighted_points(file_name, number_of_points)
+
+    selected_points = select_weighted_points(top_points, number_of_points)
 
     sccsv(selected_points, output_file)
 